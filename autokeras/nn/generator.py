@@ -1,4 +1,7 @@
 from abc import abstractmethod
+from functools import lru_cache
+from itertools import repeat
+from types import SimpleNamespace
 
 from autokeras.constant import Constant
 from autokeras.nn.graph import Graph
@@ -7,6 +10,20 @@ from autokeras.nn.layers import StubAdd, StubDense, StubReLU, get_conv_class, ge
     StubConcatenate
 
 
+@lru_cache(maxsize=None)
+def _get_layer_classes(n_dim):
+    """Return the stub layer classes for `n_dim` dimensional inputs.
+
+    The lookup is cached per `n_dim`, so constructing a generator only costs a single call.
+    """
+    return SimpleNamespace(conv=get_conv_class(n_dim),
+                           dropout=get_dropout_class(n_dim),
+                           global_avg_pooling=get_global_avg_pooling_class(n_dim),
+                           pooling=get_pooling_class(n_dim),
+                           avg_pooling=get_avg_pooling_class(n_dim),
+                           batch_norm=get_batch_norm_class(n_dim))
+
+
 class NetworkGenerator:
     """The base class for generating a network.
 
@@ -16,6 +33,7 @@ class NetworkGenerator:
         n_output_node: Number of output nodes in the network.
         input_shape: A tuple to represent the input shape.
     """
+    __slots__ = ('n_output_node', 'input_shape')
 
     def __init__(self, n_output_node, input_shape):
         """Initialize the instance.
@@ -45,6 +63,7 @@ class CnnGenerator(NetworkGenerator):
           pooling: A class that represents `(n_dim-1)` dimensional pooling.
           batch_norm: A class that represents `(n_dim-1)` dimensional batch normalization.
     """
+    __slots__ = ('n_dim', 'conv', 'dropout', 'global_avg_pooling', 'pooling', 'batch_norm')
 
     def __init__(self, n_output_node, input_shape):
         """Initialize the instance.
@@ -59,11 +78,12 @@ class CnnGenerator(NetworkGenerator):
             raise ValueError('The input dimension is too high.')
         if len(self.input_shape) < 2:
             raise ValueError('The input dimension is too low.')
-        self.conv = get_conv_class(self.n_dim)
-        self.dropout = get_dropout_class(self.n_dim)
-        self.global_avg_pooling = get_global_avg_pooling_class(self.n_dim)
-        self.pooling = get_pooling_class(self.n_dim)
-        self.batch_norm = get_batch_norm_class(self.n_dim)
+        layer_classes = _get_layer_classes(self.n_dim)
+        self.conv = layer_classes.conv
+        self.dropout = layer_classes.dropout
+        self.global_avg_pooling = layer_classes.global_avg_pooling
+        self.pooling = layer_classes.pooling
+        self.batch_norm = layer_classes.batch_norm
 
     def generate(self, model_len=None, model_width=None):
         """Generates a CNN.
@@ -84,31 +104,34 @@ class CnnGenerator(NetworkGenerator):
         temp_input_channel = self.input_shape[-1]
         output_node_id = 0
         stride = 1
+        add_chain = graph.add_chain
+        batch_norm = self.batch_norm
+        conv = self.conv
         for i in range(model_len):
-            output_node_id = graph.add_layer(StubReLU(), output_node_id)
-            output_node_id = graph.add_layer(self.batch_norm(graph.node_list[output_node_id].shape[-1]), output_node_id)
-            output_node_id = graph.add_layer(self.conv(temp_input_channel,
-                                                       model_width,
-                                                       kernel_size=3,
-                                                       stride=stride), output_node_id)
+            output_node_id = add_chain([StubReLU(),
+                                        batch_norm(temp_input_channel),
+                                        conv(temp_input_channel,
+                                             model_width,
+                                             kernel_size=3,
+                                             stride=stride)], output_node_id)
             # if stride == 1:
             #     stride = 2
             temp_input_channel = model_width
             if pooling_len == 0 or ((i + 1) % pooling_len == 0 and i != model_len - 1):
                 output_node_id = graph.add_layer(self.pooling(), output_node_id)
 
-        output_node_id = graph.add_layer(self.global_avg_pooling(), output_node_id)
-        output_node_id = graph.add_layer(self.dropout(Constant.CONV_DROPOUT_RATE), output_node_id)
-        output_node_id = graph.add_layer(StubDense(graph.node_list[output_node_id].shape[0], model_width),
-                                         output_node_id)
-        output_node_id = graph.add_layer(StubReLU(), output_node_id)
-        graph.add_layer(StubDense(model_width, self.n_output_node), output_node_id)
+        output_node_id = graph.add_chain([self.global_avg_pooling(),
+                                          self.dropout(Constant.CONV_DROPOUT_RATE)], output_node_id)
+        graph.add_chain([StubDense(temp_input_channel, model_width),
+                         StubReLU(),
+                         StubDense(model_width, self.n_output_node)], output_node_id)
         return graph
 
 
 class MlpGenerator(NetworkGenerator):
     """A class to generate Multi-Layer Perceptron.
     """
+    __slots__ = ()
 
     def __init__(self, n_output_node, input_shape):
         """Initialize the instance.
@@ -141,15 +164,17 @@ class MlpGenerator(NetworkGenerator):
         if isinstance(model_width, list) and not len(model_width) == model_len:
             raise ValueError('The length of \'model_width\' does not match \'model_len\'')
         elif isinstance(model_width, int):
-            model_width = [model_width] * model_len
+            model_width = repeat(model_width, model_len)
 
         graph = Graph(self.input_shape, False)
         output_node_id = 0
         n_nodes_prev_layer = self.input_shape[0]
+        add_chain = graph.add_chain
+        dropout_rate = Constant.MLP_DROPOUT_RATE
         for width in model_width:
-            output_node_id = graph.add_layer(StubDense(n_nodes_prev_layer, width), output_node_id)
-            output_node_id = graph.add_layer(StubDropout1d(Constant.MLP_DROPOUT_RATE), output_node_id)
-            output_node_id = graph.add_layer(StubReLU(), output_node_id)
+            output_node_id = add_chain([StubDense(n_nodes_prev_layer, width),
+                                        StubDropout1d(dropout_rate),
+                                        StubReLU()], output_node_id)
             n_nodes_prev_layer = width
 
         graph.add_layer(StubDense(n_nodes_prev_layer, self.n_output_node), output_node_id)
@@ -157,6 +182,8 @@ class MlpGenerator(NetworkGenerator):
 
 
 class ResNetGenerator(NetworkGenerator):
+    __slots__ = ('in_planes', 'block_expansion', 'n_dim', 'conv', 'dropout', 'global_avg_pooling', 'batch_norm')
+
     def __init__(self, n_output_node, input_shape):
         super(ResNetGenerator, self).__init__(n_output_node, input_shape)
         # self.layers = [2, 2, 2, 2]
@@ -167,11 +194,11 @@ class ResNetGenerator(NetworkGenerator):
             raise ValueError('The input dimension is too high.')
         elif len(self.input_shape) < 2:
             raise ValueError('The input dimension is too low.')
-        self.conv = get_conv_class(self.n_dim)
-        self.dropout = get_dropout_class(self.n_dim)
-        self.global_avg_pooling = get_global_avg_pooling_class(self.n_dim)
-        self.adaptive_avg_pooling = get_global_avg_pooling_class(self.n_dim)
-        self.batch_norm = get_batch_norm_class(self.n_dim)
+        layer_classes = _get_layer_classes(self.n_dim)
+        self.conv = layer_classes.conv
+        self.dropout = layer_classes.dropout
+        self.global_avg_pooling = layer_classes.global_avg_pooling
+        self.batch_norm = layer_classes.batch_norm
 
     def generate(self, model_len=None, model_width=None):
         if model_width is None:
@@ -180,8 +207,8 @@ class ResNetGenerator(NetworkGenerator):
         temp_input_channel = self.input_shape[-1]
         output_node_id = 0
         # output_node_id = graph.add_layer(StubReLU(), output_node_id)
-        output_node_id = graph.add_layer(self.conv(temp_input_channel, model_width, kernel_size=3), output_node_id)
-        output_node_id = graph.add_layer(self.batch_norm(model_width), output_node_id)
+        output_node_id = graph.add_chain([self.conv(temp_input_channel, model_width, kernel_size=3),
+                                          self.batch_norm(model_width)], output_node_id)
         # output_node_id = graph.add_layer(self.pooling(kernel_size=3, stride=2, padding=1), output_node_id)
 
         output_node_id = self._make_layer(graph, model_width, 2, output_node_id, 1)
@@ -192,8 +219,8 @@ class ResNetGenerator(NetworkGenerator):
         model_width *= 2
         output_node_id = self._make_layer(graph, model_width, 2, output_node_id, 2)
 
-        output_node_id = graph.add_layer(self.global_avg_pooling(), output_node_id)
-        graph.add_layer(StubDense(model_width * self.block_expansion, self.n_output_node), output_node_id)
+        graph.add_chain([self.global_avg_pooling(),
+                         StubDense(model_width * self.block_expansion, self.n_output_node)], output_node_id)
         return graph
 
     def _make_layer(self, graph, planes, blocks, node_id, stride):
@@ -205,24 +232,26 @@ class ResNetGenerator(NetworkGenerator):
         return out
 
     def _make_block(self, graph, in_planes, planes, node_id, stride=1):
-        out = graph.add_layer(self.batch_norm(in_planes), node_id)
-        out = graph.add_layer(StubReLU(), out)
-        residual_node_id = out
-        out = graph.add_layer(self.conv(in_planes, planes, kernel_size=3, stride=stride), out)
-        out = graph.add_layer(self.batch_norm(planes), out)
-        out = graph.add_layer(StubReLU(), out)
-        out = graph.add_layer(self.conv(planes, planes, kernel_size=3), out)
-
-        residual_node_id = graph.add_layer(StubReLU(), residual_node_id)
-        residual_node_id = graph.add_layer(self.conv(in_planes,
-                                                     planes * self.block_expansion,
-                                                     kernel_size=1,
-                                                     stride=stride), residual_node_id)
+        residual_node_id = graph.add_chain([self.batch_norm(in_planes),
+                                            StubReLU()], node_id)
+        out = graph.add_chain([self.conv(in_planes, planes, kernel_size=3, stride=stride),
+                               self.batch_norm(planes),
+                               StubReLU(),
+                               self.conv(planes, planes, kernel_size=3)], residual_node_id)
+
+        residual_node_id = graph.add_chain([StubReLU(),
+                                            self.conv(in_planes,
+                                                      planes * self.block_expansion,
+                                                      kernel_size=1,
+                                                      stride=stride)], residual_node_id)
         out = graph.add_layer(StubAdd(), (out, residual_node_id))
         return out
 
 
 class DenseNetGenerator(NetworkGenerator):
+    __slots__ = ('num_init_features', 'growth_rate', 'block_config', 'bn_size', 'drop_rate',
+                 'n_dim', 'conv', 'dropout', 'global_avg_pooling', 'max_pooling', 'avg_pooling', 'batch_norm')
+
     def __init__(self, n_output_node, input_shape):
         super().__init__(n_output_node, input_shape)
         # DenseNet Constant
@@ -233,13 +262,13 @@ class DenseNetGenerator(NetworkGenerator):
         self.drop_rate = 0
         # Stub layers
         self.n_dim = len(self.input_shape) - 1
-        self.conv = get_conv_class(self.n_dim)
-        self.dropout = get_dropout_class(self.n_dim)
-        self.global_avg_pooling = get_global_avg_pooling_class(self.n_dim)
-        self.adaptive_avg_pooling = get_global_avg_pooling_class(self.n_dim)
-        self.max_pooling = get_pooling_class(self.n_dim)
-        self.avg_pooling = get_avg_pooling_class(self.n_dim)
-        self.batch_norm = get_batch_norm_class(self.n_dim)
+        layer_classes = _get_layer_classes(self.n_dim)
+        self.conv = layer_classes.conv
+        self.dropout = layer_classes.dropout
+        self.global_avg_pooling = layer_classes.global_avg_pooling
+        self.max_pooling = layer_classes.pooling
+        self.avg_pooling = layer_classes.avg_pooling
+        self.batch_norm = layer_classes.batch_norm
 
     def generate(self, model_len=None, model_width=None):
         if model_len is None:
@@ -250,11 +279,10 @@ class DenseNetGenerator(NetworkGenerator):
         temp_input_channel = self.input_shape[-1]
         # First convolution
         output_node_id = 0
-        output_node_id = graph.add_layer(self.conv(temp_input_channel, model_width, kernel_size=7),
-                                         output_node_id)
-        output_node_id = graph.add_layer(self.batch_norm(num_features=self.num_init_features), output_node_id)
-        output_node_id = graph.add_layer(StubReLU(), output_node_id)
-        db_input_node_id = graph.add_layer(self.max_pooling(kernel_size=3, stride=2, padding=1), output_node_id)
+        db_input_node_id = graph.add_chain([self.conv(temp_input_channel, model_width, kernel_size=7),
+                                            self.batch_norm(num_features=self.num_init_features),
+                                            StubReLU(),
+                                            self.max_pooling(kernel_size=3, stride=2, padding=1)], output_node_id)
         # Each DensebLock
         num_features = self.num_init_features
         for i, num_layers in enumerate(self.block_config):
@@ -269,12 +297,11 @@ class DenseNetGenerator(NetworkGenerator):
                                                     graph=graph, input_node_id=db_input_node_id)
                 num_features = num_features // 2
         # Final batch norm
-        out = graph.add_layer(self.batch_norm(num_features), db_input_node_id)
-
-        out = graph.add_layer(StubReLU(), out)
-        out = graph.add_layer(self.adaptive_avg_pooling(), out)
-        # Linear layer
-        graph.add_layer(StubDense(num_features, self.n_output_node), out)
+        graph.add_chain([self.batch_norm(num_features),
+                         StubReLU(),
+                         self.global_avg_pooling(),
+                         # Linear layer
+                         StubDense(num_features, self.n_output_node)], db_input_node_id)
         return graph
 
     def _dense_block(self, num_layers, num_input_features, bn_size, growth_rate, drop_rate, graph, input_node_id):
@@ -286,27 +313,28 @@ class DenseNetGenerator(NetworkGenerator):
         return block_input_node
 
     def _dense_layer(self, num_input_features, growth_rate, bn_size, drop_rate, graph, input_node_id):
-        out = graph.add_layer(self.batch_norm(num_features=num_input_features), input_node_id)
-        out = graph.add_layer(StubReLU(), out)
-        out = graph.add_layer(self.conv(num_input_features, bn_size * growth_rate, kernel_size=1, stride=1), out)
-        out = graph.add_layer(self.batch_norm(bn_size * growth_rate), out)
-        out = graph.add_layer(StubReLU(), out)
-        out = graph.add_layer(self.conv(bn_size * growth_rate, growth_rate, kernel_size=3, stride=1, padding=1), out)
-        out = graph.add_layer(self.dropout(rate=drop_rate), out)
+        out = graph.add_chain([self.batch_norm(num_features=num_input_features),
+                               StubReLU(),
+                               self.conv(num_input_features, bn_size * growth_rate, kernel_size=1, stride=1),
+                               self.batch_norm(bn_size * growth_rate),
+                               StubReLU(),
+                               self.conv(bn_size * growth_rate, growth_rate, kernel_size=3, stride=1, padding=1),
+                               self.dropout(rate=drop_rate)], input_node_id)
         out = graph.add_layer(StubConcatenate(), (input_node_id, out))
         return out
 
     def _transition(self, num_input_features, num_output_features, graph, input_node_id):
-        out = graph.add_layer(self.batch_norm(num_features=num_input_features), input_node_id)
-        out = graph.add_layer(StubReLU(), out)
-        out = graph.add_layer(self.conv(num_input_features, num_output_features, kernel_size=1, stride=1), out)
-        out = graph.add_layer(self.avg_pooling(kernel_size=2, stride=2), out)
-        return out
+        return graph.add_chain([self.batch_norm(num_features=num_input_features),
+                                StubReLU(),
+                                self.conv(num_input_features, num_output_features, kernel_size=1, stride=1),
+                                self.avg_pooling(kernel_size=2, stride=2)], input_node_id)
     
        
 class MobileNetV2Generator(NetworkGenerator):
      #Generate MobileNetV2 according to:
      #  https://github.com/kuangliu/pytorch-cifar/blob/master/models/mobilenetv2.py
+    __slots__ = ('cfg', '_plan', 'in_planes', 'block_expansion', 'n_dim', 'conv', 'dropout', 'global_avg_pooling', 'batch_norm')
+
     def __init__(self, n_output_node, input_shape):
         super(MobileNetV2Generator, self).__init__(n_output_node, input_shape)
           
@@ -329,6 +357,11 @@ class MobileNetV2Generator(NetworkGenerator):
            #(6, 160, 3, 2),
            #(6, 320, 1, 1)]
         
+        # One (expansion, out_planes, stride) tuple per block; only the first block of a stage is strided.
+        self._plan = tuple((expansion, out_planes, stride if i == 0 else 1)
+                           for expansion, out_planes, num_blocks, stride in self.cfg
+                           for i in range(num_blocks))
+
         self.in_planes = 32
         self.block_expansion = 1
         self.n_dim = len(self.input_shape) - 1
@@ -337,11 +370,11 @@ class MobileNetV2Generator(NetworkGenerator):
             raise ValueError('The input dimension is too high.')
         elif len(self.input_shape) < 2:
             raise ValueError('The input dimension is too low.')
-        self.conv = get_conv_class(self.n_dim)
-        self.dropout = get_dropout_class(self.n_dim)
-        self.global_avg_pooling = get_global_avg_pooling_class(self.n_dim)
-        self.adaptive_avg_pooling = get_global_avg_pooling_class(self.n_dim)
-        self.batch_norm = get_batch_norm_class(self.n_dim)
+        layer_classes = _get_layer_classes(self.n_dim)
+        self.conv = layer_classes.conv
+        self.dropout = layer_classes.dropout
+        self.global_avg_pooling = layer_classes.global_avg_pooling
+        self.batch_norm = layer_classes.batch_norm
 
     def generate(self, model_len=None, model_width=None):
                 
@@ -352,75 +385,68 @@ class MobileNetV2Generator(NetworkGenerator):
         #out_planes = self.in_planes*self.n_output_node
         out_planes = 24
         
-        output_node_id = graph.add_layer(self.conv(temp_input_channel,
-                                                       self.in_planes,
-                                                       kernel_size=3,
-                                                       stride=1,
-                                                       padding=1), output_node_id)
-        output_node_id = graph.add_layer(self.batch_norm(graph.node_list[output_node_id].shape[-1]), output_node_id)
-        output_node_id = graph.add_layer(StubReLU(), output_node_id)
+        output_node_id = graph.add_chain([self.conv(temp_input_channel,
+                                                    self.in_planes,
+                                                    kernel_size=3,
+                                                    stride=1,
+                                                    padding=1),
+                                          self.batch_norm(self.in_planes),
+                                          StubReLU()], output_node_id)
        
         output_node_id = self._make_layer(graph, output_node_id)
 
        
-        output_node_id = graph.add_layer(self.conv(out_planes,
-                                                       out_planes*4,
-                                                       kernel_size=1,
-                                                       stride=1,
-                                                       padding=0), output_node_id)
-        output_node_id = graph.add_layer(self.batch_norm(graph.node_list[output_node_id].shape[-1]), output_node_id)
-        output_node_id = graph.add_layer(StubReLU(), output_node_id)
-        
-        output_node_id = graph.add_layer(self.global_avg_pooling(), output_node_id)
-        graph.add_layer(StubDense(out_planes*4, self.n_output_node), output_node_id)
+        graph.add_chain([self.conv(out_planes,
+                                   out_planes*4,
+                                   kernel_size=1,
+                                   stride=1,
+                                   padding=0),
+                         self.batch_norm(out_planes*4),
+                         StubReLU(),
+                         self.global_avg_pooling(),
+                         StubDense(out_planes*4, self.n_output_node)], output_node_id)
         return graph
 
     def _make_layer(self, graph, node_id):        
         
         out = node_id       
-        for expansion, out_planes, num_blocks, stride in self.cfg:
-            strides = [stride] + [1]*(num_blocks-1)
-            for stride in strides:
-                out =self._make_block(graph,self.in_planes, out_planes, expansion, out, stride)
-                self.in_planes = out_planes
+        for expansion, out_planes, stride in self._plan:
+            out =self._make_block(graph,self.in_planes, out_planes, expansion, out, stride)
+            self.in_planes = out_planes
         return out
 
     def _make_block(self, graph, in_planes, out_planes, expansion, node_id, stride):   
        
         planes = expansion * in_planes
-        output_node_id = graph.add_layer(self.conv(in_planes,
-                                                       planes,
-                                                       kernel_size=1,
-                                                       stride=1,
-                                                       padding=0), node_id)
-        output_node_id = graph.add_layer(self.batch_norm(graph.node_list[output_node_id].shape[-1]), output_node_id)
-        output_node_id = graph.add_layer(StubReLU(), output_node_id)
-        
-        output_node_id = graph.add_layer(self.conv(planes,
-                                                       planes,
-                                                       kernel_size=3,
-                                                       stride=stride,
-                                                       padding=1,
-                                                       groups=planes), output_node_id)
-        output_node_id = graph.add_layer(self.batch_norm(graph.node_list[output_node_id].shape[-1]), output_node_id)
-        output_node_id = graph.add_layer(StubReLU(), output_node_id)
-        
-        output_node_id = graph.add_layer(self.conv(planes,
-                                                       out_planes,
-                                                       kernel_size=1,
-                                                       stride=1,
-                                                       padding=0), output_node_id)
-        output_node_id = graph.add_layer(self.batch_norm(graph.node_list[output_node_id].shape[-1]), output_node_id)
+        output_node_id = graph.add_chain([self.conv(in_planes,
+                                                    planes,
+                                                    kernel_size=1,
+                                                    stride=1,
+                                                    padding=0),
+                                          self.batch_norm(planes),
+                                          StubReLU(),
+                                          self.conv(planes,
+                                                    planes,
+                                                    kernel_size=3,
+                                                    stride=stride,
+                                                    padding=1,
+                                                    groups=planes),
+                                          self.batch_norm(planes),
+                                          StubReLU(),
+                                          self.conv(planes,
+                                                    out_planes,
+                                                    kernel_size=1,
+                                                    stride=1,
+                                                    padding=0),
+                                          self.batch_norm(out_planes)], node_id)
         
         if stride == 1 and in_planes != out_planes:
-            shortcut_node_id = node_id
-            shortcut_node_id = graph.add_layer(self.conv(in_planes,
-                                                       out_planes,
-                                                       kernel_size=1,
-                                                       stride=1,
-                                                       padding=0), shortcut_node_id)
-            shortcut_node_id = graph.add_layer(self.batch_norm(graph.node_list[shortcut_node_id].shape[-1]), shortcut_node_id)
+            shortcut_node_id = graph.add_chain([self.conv(in_planes,
+                                                          out_planes,
+                                                          kernel_size=1,
+                                                          stride=1,
+                                                          padding=0),
+                                                self.batch_norm(out_planes)], node_id)
             output_node_id = graph.add_layer(StubAdd(), (output_node_id, shortcut_node_id))
        
         return output_node_id
-
@@ -144,6 +144,31 @@ class Graph:
         layer.output = self.node_list[output_node_id]
         return output_node_id
 
+    def add_chain(self, layers, input_node_id):
+        """Add a sequence of layers to the Graph, each one taking the output of the previous one.
+
+        Equivalent to calling `add_layer` on every layer in turn, but without the per-call dispatch.
+        Every layer in the chain must take a single input node.
+
+        Args:
+            layers: A list of instances of the subclasses of StubLayer in layers.py.
+            input_node_id: An integer. The ID of the input node of the first layer.
+
+        Returns:
+            output_node_id: An integer. The ID of the output node of the last layer.
+        """
+        node_list = self.node_list
+        add_node = self._add_node
+        add_edge = self._add_edge
+        output_node_id = input_node_id
+        for layer in layers:
+            layer.input = node_list[output_node_id]
+            new_node_id = add_node(Node(layer.output_shape))
+            add_edge(layer, output_node_id, new_node_id)
+            layer.output = node_list[new_node_id]
+            output_node_id = new_node_id
+        return output_node_id
+
     def clear_operation_history(self):
         self.operation_history = []
 